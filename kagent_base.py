@@ -0,0 +1,462 @@
+import re
+import asyncio
+import heapq
+import random
+from pprint import pformat
+from gomoku import Agent
+from gomoku.core.models import Player
+
+# Line directions scanned for five-in-a-row windows, and the 8-neighbourhood of a cell
+_DIRS = ((0, 1), (1, 0), (1, 1), (1, -1))
+_NBRS = tuple((dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if (dr, dc) != (0, 0))
+
+# Non-identity rotations/reflections of a square board, as (r, c, size - 1) -> (r, c)
+_SYMMETRIES = (
+    lambda r, c, n: (c, n - r),
+    lambda r, c, n: (n - r, n - c),
+    lambda r, c, n: (n - c, r),
+    lambda r, c, n: (r, n - c),
+    lambda r, c, n: (n - r, c),
+    lambda r, c, n: (c, r),
+    lambda r, c, n: (n - c, n - r),
+)
+
+_RATING_RE = re.compile(r'\{\s*"rating"\s*:\s*(\d+(?:\.\d+)?)\s*\}')
+_MOVE_RE = re.compile(r'\{\s*"row"\s*:\s*(\d+)\s*,\s*"col"\s*:\s*(\d+)\s*\}')
+
+
+def _parse_rating(content):
+    match = _RATING_RE.search(content)
+    return float(match[1]) if match else None
+
+
+def _parse_move(content):
+    match = _MOVE_RE.search(content)
+    return (int(match[1]), int(match[2])) if match else None
+
+
+# LLM clients shared by every agent in the process, keyed by client class and settings. Only for
+# clients with no event-loop bound state (e.g. loaded Hugging Face weights): an async HTTP pool is
+# tied to the loop it first ran on and breaks once that loop is closed.
+_CLIENTS = {}
+
+
+def _shared_client(client_class, **settings):
+    key = (client_class, tuple(sorted(settings.items())))
+    client = _CLIENTS.get(key)
+    if client is None:
+        client = _CLIENTS[key] = client_class(**settings)
+    return client
+
+
+def _sum5(x0, x1, x2, x3, x4):
+    # Bit-sliced sum of five bit planes: the (ones, twos, fours) bits of the count at every position
+    partial = x0 ^ x1 ^ x2
+    carry = (x0 & x1) | (x2 & (x0 ^ x1))
+    carry2 = (partial & x3) | (x4 & (partial ^ x3))
+    return partial ^ x3 ^ x4, carry ^ carry2, carry & carry2
+
+
+def _count_is(planes, n):
+    # Positions whose bit-sliced count equals n
+    ones, twos, fours = planes
+    return (ones if n & 1 else ~ones) & (twos if n & 2 else ~twos) & (fours if n & 4 else ~fours)
+
+
+def _threat_cells(lines, size, own, empty, stones_needed, empty_needed):
+    # Yield the first empty cell of every window holding exactly the requested stones/empties, in
+    # (r, c, direction) order. Per direction, shifting the bitboards by i steps puts each window's
+    # i-th cell on its start bit, so every window start is counted at once.
+    hits = []
+    for step, starts in lines:
+        stones = _sum5(*[own >> (step * i) for i in range(5)])
+        empties = _sum5(*[empty >> (step * i) for i in range(5)])
+        hits.append(_count_is(stones, stones_needed) & _count_is(empties, empty_needed) & starts)
+    while any(hits):
+        start, k = min(((h & -h).bit_length() - 1, k) for k, h in enumerate(hits) if h)
+        hits[k] &= hits[k] - 1
+        step = lines[k][0]
+        cell = next(start + step * i for i in range(5) if empty >> (start + step * i) & 1)
+        yield divmod(cell, size)
+
+
+def _spread(starts, step):
+    # Every cell of the windows starting on the given bits
+    return starts | starts << step | starts << (2 * step) | starts << (3 * step) | starts << (4 * step)
+
+
+def _meet(starts, step, meet):
+    # Intersect meet (None for "no window yet") with each window starting on the given bits
+    span = _spread(1, step)
+    while starts and meet != 0:
+        low = starts & -starts
+        meet = span * low if meet is None else meet & span * low
+        starts ^= low
+    return meet
+
+
+def _threat_outlook(lines, player, rival):
+    # Summarise which threat bonuses the position earns after a player stone on any empty cell;
+    # see _threat_bonus. A four is 4 stones + 1 empty in a window, a three 3 stones + 2 empties,
+    # i.e. 4 or 3 stones of one colour and none of the other. Windows are counted per direction
+    # with the same shift scan as _threat_cells.
+    grow_four = grow_three = 0  # cells of player 3-stone / 2-stone windows
+    four_gaps = rival_four_gaps = 0  # empty cells of player / rival fours
+    three_meet = rival_three_meet = None  # cells shared by every player / rival three
+    for step, starts in lines:
+        mine = _sum5(*[player >> (step * i) for i in range(5)])
+        theirs = _sum5(*[rival >> (step * i) for i in range(5)])
+        only_mine = _count_is(theirs, 0) & starts
+        only_theirs = _count_is(mine, 0) & starts
+        threes = _count_is(mine, 3) & only_mine
+        four_gaps |= _spread(_count_is(mine, 4) & only_mine, step) & ~player
+        grow_four |= _spread(threes, step)
+        grow_three |= _spread(_count_is(mine, 2) & only_mine, step)
+        three_meet = _meet(threes, step, three_meet)
+        rival_four_gaps |= _spread(_count_is(theirs, 4) & only_theirs, step) & ~rival
+        rival_three_meet = _meet(_count_is(theirs, 3) & only_theirs, step, rival_three_meet)
+    return grow_four, four_gaps, grow_three, three_meet, rival_four_gaps, rival_three_meet
+
+
+def _threat_bonus(outlook, bit):
+    # The player stone on bit only adds to windows through it: a player four/three either already
+    # exists elsewhere or grows from a 3/2-stone window through bit, and a rival four/three
+    # survives unless every one of them runs through bit
+    grow_four, four_gaps, grow_three, three_meet, rival_four_gaps, rival_three_meet = outlook
+    score = 0
+    if bit & grow_four or four_gaps & ~bit:
+        score += 50
+    if rival_four_gaps & ~bit:
+        score += 45
+    if bit & grow_three or three_meet is not None and not bit & three_meet:
+        score += 20
+    if rival_three_meet is not None and not bit & rival_three_meet:
+        score += 15
+    return score
+
+
+class _BaseAgent(Agent):
+    # Board analysis and LLM plumbing shared by the agents; subclasses set self.llm and self.debug
+    # in _setup before calling super()._setup(), and may override _build_messages. The analysis
+    # methods (_candidate_moves, _find_threat_move, _score_moves, ...) read the bitboards, so
+    # _load_bitboards must have run for the game_state they are given.
+    # Rate each candidate in its own request, sent concurrently. That only saves time when the
+    # requests really overlap, i.e. for a remote HTTP client; a local model would run them one after
+    # another, so by default one prompt lists every candidate and the reply picks a move.
+    _rate_each_candidate = False
+    # Model to name in the debug log before each LLM call, when a subclass sets one
+    model_name = None
+
+    def _setup(self):
+        # Board-size dependent lookup tables, built on first use
+        self._line_cache = {}
+        self._neighborhood_cache = {}
+        self._edge_cache = {}
+        self._centrality_cache = {}
+        # Per-symbol bitboards of the position being analysed, bit index r * size + c, and scan
+        # results for that position (reset whenever the bitboards are reloaded)
+        self._bitboards = {}
+        self._turn_cache = {}
+
+    def log(self, msg):
+        if self.debug:
+            print(f"[DEBUG] {msg}")
+
+    def _lines(self, size):
+        # (bit step, mask of in-bounds window starts) for each direction in _DIRS
+        lines = self._line_cache.get(size)
+        if lines is None:
+            lines = []
+            for dr, dc in _DIRS:
+                starts = 0
+                for r in range(size):
+                    for c in range(size):
+                        if 0 <= r + dr * 4 < size and 0 <= c + dc * 4 < size:
+                            starts |= 1 << (r * size + c)
+                lines.append((dr * size + dc, starts))
+            lines = self._line_cache[size] = tuple(lines)
+        return lines
+
+    def _edges(self, size):
+        # (all cells, all but the first column, all but the last column) masks
+        edges = self._edge_cache.get(size)
+        if edges is None:
+            full = (1 << (size * size)) - 1
+            first_col = sum(1 << (r * size) for r in range(size))
+            edges = self._edge_cache[size] = (full, full & ~first_col, full & ~(first_col << (size - 1)))
+        return edges
+
+    def _neighborhoods(self, size, radius):
+        # Mask of the block of cells within Chebyshev distance radius of every cell
+        masks = self._neighborhood_cache.get((size, radius))
+        if masks is None:
+            masks = []
+            for r in range(size):
+                for c in range(size):
+                    mask = 0
+                    for nr in range(max(0, r - radius), min(size, r + radius + 1)):
+                        for nc in range(max(0, c - radius), min(size, c + radius + 1)):
+                            mask |= 1 << (nr * size + nc)
+                    masks.append(mask)
+            masks = self._neighborhood_cache[(size, radius)] = tuple(masks)
+        return masks
+
+    def _centrality(self, size):
+        # Per-cell centre bonus, growing towards the centre of the board
+        table = self._centrality_cache.get(size)
+        if table is None:
+            center = size // 2
+            table = self._centrality_cache[size] = tuple(
+                max(0, (center - abs(r - center)) + (center - abs(c - center)))
+                for r in range(size)
+                for c in range(size)
+            )
+        return table
+
+    def _load_bitboards(self, game_state):
+        # Once per turn, at C speed: map one symbol's cells to "1" and the rest to "0", then read the
+        # reversed row-major string as a base-2 int so cell r * size + c lands on bit r * size + c
+        flat = "".join(map("".join, game_state.board))[::-1]
+        symbols = "".join(set(flat) | {"."})
+        bitboards = {}
+        for symbol in symbols:
+            table = str.maketrans(symbols, "".join("1" if s == symbol else "0" for s in symbols))
+            bitboards[symbol] = int(flat.translate(table) or "0", 2)
+        self._bitboards = bitboards
+        self._turn_cache = {}
+
+    def _candidate_moves(self, game_state):
+        # Empty cells within two cells of a stone, read off the bitboards in row-major order;
+        # every legal move when there are none
+        size = game_state.board_size
+        full, not_first_col, not_last_col = self._edges(size)
+        empty = self._bitboards["."]
+        # Dilate the stones by one column twice, then by one row twice; masking out the first/last
+        # column keeps horizontal shifts from wrapping into the neighbouring row
+        near = ~empty & full
+        for _ in range(2):
+            near |= ((near << 1) & not_first_col) | ((near >> 1) & not_last_col)
+        for _ in range(2):
+            near |= (near << size) | (near >> size)
+        near &= empty
+        moves = []
+        while near:
+            low = near & -near
+            move = divmod(low.bit_length() - 1, size)
+            if game_state.is_valid_move(*move):
+                moves.append(move)
+            near ^= low
+        return moves or game_state.get_legal_moves()
+
+    def _distinct_moves(self, game_state, moves):
+        # Drop moves that a symmetry of the current position maps onto a smaller move: they lead to
+        # equivalent positions and identical scores. Only odd boards, where scoring is symmetric.
+        size = game_state.board_size
+        if size % 2 == 0:
+            return moves
+        board = game_state.board
+        n = size - 1
+        occupied = ~self._bitboards["."] & self._edges(size)[0]
+        stones = []
+        while occupied:
+            low = occupied & -occupied
+            stones.append(divmod(low.bit_length() - 1, size))
+            occupied ^= low
+        group = [
+            t for t in _SYMMETRIES
+            if all(board[tr][tc] == board[r][c] for r, c in stones for tr, tc in [t(r, c, n)])
+        ]
+        if not group:
+            return moves
+        return [(r, c) for r, c in moves if all((r, c) <= t(r, c, n) for t in group)]
+
+    def _find_threat_move(self, game_state, symbol, stones_needed, empty_needed):
+        key = ("threat", symbol, stones_needed, empty_needed)
+        if key in self._turn_cache:
+            move = self._turn_cache[key]
+        else:
+            own = self._bitboards.get(symbol, 0)
+            empty = self._bitboards["."]
+            size = game_state.board_size
+            cells = _threat_cells(self._lines(size), size, own, empty, stones_needed, empty_needed)
+            move = self._turn_cache[key] = next((m for m in cells if game_state.is_valid_move(*m)), None)
+        return move
+
+    def _outlook(self, game_state, player_symbol, rival_symbol):
+        key = ("outlook", player_symbol, rival_symbol)
+        outlook = self._turn_cache.get(key)
+        if outlook is None:
+            outlook = self._turn_cache[key] = _threat_outlook(
+                self._lines(game_state.board_size),
+                self._bitboards.get(player_symbol, 0),
+                self._bitboards.get(rival_symbol, 0),
+            )
+        return outlook
+
+    def _score_moves(self, game_state, moves, player_symbol, rival_symbol):
+        # (move, score) for a batch of moves: centrality from the per-size table, 2 per occupied
+        # neighbour via one popcount, and the threat bonus from the turn's outlook
+        size = game_state.board_size
+        centrality = self._centrality(size)
+        adjacent = self._neighborhoods(size, 1)
+        occupied = self._bitboards.get(player_symbol, 0) | self._bitboards.get(rival_symbol, 0)
+        outlook = self._outlook(game_state, player_symbol, rival_symbol)
+        scored = []
+        for r, c in moves:
+            i = r * size + c
+            score = centrality[i] + 2 * (occupied & adjacent[i]).bit_count() + _threat_bonus(outlook, 1 << i)
+            scored.append(((r, c), score))
+        return scored
+
+    def _system_message(self, player_symbol, rival_symbol):
+        return {
+            "role": "system",
+            "content": (
+                f"You are a professional Gomoku player playing as {player_symbol}. "
+                f"Opponent is {rival_symbol}.\n"
+                f"Think deeply but output only JSON.\n"
+            ),
+        }
+
+    def _build_messages(self, board_str, threat_text, top_moves, player_symbol, rival_symbol):
+        # One chat asking the LLM to pick a move from top_moves
+        moves_str = "\n".join([f"{i+1}. {m[0]} (score {m[1]})" for i, m in enumerate(top_moves)])
+        return [
+            self._system_message(player_symbol, rival_symbol),
+            {
+                "role": "user",
+                "content": (
+                    f"Board:\n{board_str}\n\n"
+                    f"Threat Analysis:\n{threat_text}\n\n"
+                    f"Candidate Moves:\n{moves_str}\n\n"
+                    f"Output ONLY JSON: {{\"row\": <row>, \"col\": <col>}}"
+                ),
+            },
+        ]
+
+    def _build_rating_messages(self, board_str, threat_text, top_moves, player_symbol, rival_symbol):
+        # One chat per candidate in top_moves, asking the LLM to rate it
+        system_message = self._system_message(player_symbol, rival_symbol)
+        return [
+            [
+                system_message,
+                {
+                    "role": "user",
+                    "content": (
+                        f"Board:\n{board_str}\n\n"
+                        f"Threat Analysis:\n{threat_text}\n\n"
+                        f"Candidate Move: {m} (score {score})\n\n"
+                        f"Rate this move from 0 (losing) to 10 (best).\n"
+                        f"Output ONLY JSON: {{\"rating\": <rating>}}"
+                    ),
+                },
+            ]
+            for m, score in top_moves
+        ]
+
+    async def get_move(self, game_state):
+        player_symbol = self.player.value
+        rival_symbol = (Player.WHITE if self.player == Player.BLACK else Player.BLACK).value
+        self._load_bitboards(game_state)
+
+        # Opening: take the centre on an empty board and answer a lone centre stone next to it,
+        # without running the analysis or asking the LLM
+        size = game_state.board_size
+        center = size // 2
+        empty = self._bitboards["."]
+        stones = size * size - empty.bit_count()
+        if stones == 0 and game_state.is_valid_move(center, center):
+            return (center, center)
+        if stones == 1 and not empty >> (center * size + center) & 1:
+            replies = [(center + dr, center + dc) for dr, dc in _NBRS if game_state.is_valid_move(center + dr, center + dc)]
+            if replies:
+                return random.choice(replies)
+
+        # Immediate win/block
+        for symbol, stones_needed, empty_needed, reason in (
+            (player_symbol, 4, 1, "Immediate Win"),
+            (rival_symbol, 4, 1, "Immediate Block"),
+            (rival_symbol, 3, 2, "Block 3-in-a-row"),
+        ):
+            move = self._find_threat_move(game_state, symbol, stones_needed, empty_needed)
+            if move:
+                self.log(f"{reason} at {move}")
+                return move
+
+        # Score moves
+        candidate_moves = self._candidate_moves(game_state)
+        if not candidate_moves:
+            return None
+        if stones < 6:
+            candidate_moves = self._distinct_moves(game_state, candidate_moves)
+        scored_moves = self._score_moves(game_state, candidate_moves, player_symbol, rival_symbol)
+        top_moves = heapq.nlargest(3, scored_moves, key=lambda x: x[1])
+        self.log(f"Top 3 moves for LLM: {top_moves}")
+
+        # Threat summary
+        threat_summary = []
+        opp4 = self._find_threat_move(game_state, rival_symbol, 4, 1)
+        if opp4:
+            threat_summary.append(f"Opponent has open-4 at {opp4}, blocking is critical.")
+        my4 = self._find_threat_move(game_state, player_symbol, 4, 1)
+        if my4:
+            threat_summary.append(f"You have open-4 at {my4}, winning move possible.")
+        opp3 = self._find_threat_move(game_state, rival_symbol, 3, 2)
+        if opp3:
+            threat_summary.append(f"Opponent has open-3 at {opp3}, blocking is urgent.")
+        my3 = self._find_threat_move(game_state, player_symbol, 3, 2)
+        if my3:
+            threat_summary.append(f"You have open-3 at {my3}, attack opportunity.")
+
+        threat_text = "\n".join(threat_summary) if threat_summary else "No immediate urgent threats detected."
+        board_str = game_state.format_board("standard")
+
+        if self.model_name:
+            self.log(f"Sending to LLM model: {self.model_name}")
+        if self._rate_each_candidate:
+            return await self._rate_candidates(board_str, threat_text, top_moves, player_symbol, rival_symbol)
+
+        messages = self._build_messages(board_str, threat_text, top_moves, player_symbol, rival_symbol)
+        if self.debug:
+            self.log("Messages to LLM:")
+            self.log(pformat(messages))
+
+        content = await self.llm.complete(messages)
+        self.log(f"LLM Response: {content}")
+
+        move = _parse_move(content)
+        if move is None:
+            self.log("LLM parsing failed: no move in response")
+        elif game_state.is_valid_move(*move):
+            return move
+        else:
+            self.log(f"LLM chose an invalid move: {move}")
+        return top_moves[0][0]
+
+    async def _rate_candidates(self, board_str, threat_text, top_moves, player_symbol, rival_symbol):
+        # The highest-rated candidate; ties keep the heuristic order, and the top heuristic move is
+        # played when no reply parses
+        batch = self._build_rating_messages(board_str, threat_text, top_moves, player_symbol, rival_symbol)
+        if self.debug:
+            self.log("Messages to LLM:")
+            self.log(pformat(batch))
+
+        # One request per candidate, sent concurrently so latency is the slowest reply, not the sum
+        responses = await asyncio.gather(
+            *(self.llm.complete(messages) for messages in batch),
+            return_exceptions=True,
+        )
+
+        best_move, best_rating = top_moves[0][0], None
+        for (m, _), content in zip(top_moves, responses):
+            self.log(f"LLM Response for {m}: {content}")
+            if isinstance(content, Exception):
+                self.log(f"LLM request failed: {content}")
+                continue
+            rating = _parse_rating(content)
+            if rating is None:
+                self.log("LLM parsing failed: no rating in response")
+            elif best_rating is None or rating > best_rating:
+                best_move, best_rating = m, rating
+
+        return best_move